@@ -1,4 +1,118 @@
-import os, sys, re
+import os, sys, re, errno, struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+BUFSIZE = 1024 * 1024  # read size for the userspace copy loops
+HEADER = struct.Struct(">QQ")  # file size, filename length (big-endian u64)
+NAME_MAX = 255         # filename bytes read speculatively along with each header
+CREATE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC  # open flags for files we write
+ARCHIVE_WORKERS = 4    # threads opening and prefetching files ahead of the archive writer
+EXTRACT_WORKERS = os.cpu_count() or 1  # threads writing out extracted files
+
+
+def _kernel_copy(fd_in, fd_out, count, offset=None):
+    """
+    Copies up to count bytes from fd_in to fd_out without passing through
+    userspace, using copy_file_range (which may reflink) or sendfile.
+    Reads from fd_in at offset if given, leaving its file position alone,
+    otherwise from its current position.
+
+    Returns the number of bytes copied; the caller copies any remainder
+    itself if the kernel refuses or stops early.
+    """
+    copied = 0
+    for method in ('copy_file_range', 'sendfile'):
+        if not hasattr(os, method):
+            continue
+        try:
+            while copied < count:
+                src_offset = None if offset is None else offset + copied
+                if method == 'copy_file_range':
+                    n = os.copy_file_range(fd_in, fd_out, count - copied, src_offset)
+                else:
+                    n = os.sendfile(fd_out, fd_in, src_offset, count - copied)
+                if n == 0:
+                    break
+                copied += n
+            return copied
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.ENOSYS, errno.EXDEV, errno.ENOTSOCK, errno.EOPNOTSUPP):
+                raise
+    return copied
+
+
+def _open_member(file):
+    """
+    Opens a file to be archived and asks the kernel to start reading it
+    into the page cache, so the writer finds its data already resident.
+
+    Returns (fd, filesize).
+    """
+    fd = os.open(file, os.O_RDONLY)
+    filesize = os.fstat(fd).st_size
+    try:
+        os.posix_fadvise(fd, 0, filesize, os.POSIX_FADV_WILLNEED)
+    except (AttributeError, OSError):
+        pass
+    return fd, filesize
+
+
+def _prefetch(files, workers):
+    """
+    Yields (file, open_member) pairs in order, where open_member() returns
+    _open_member(file). With more than one worker, up to `workers` files
+    are opened and prefetched on a thread pool while the caller writes
+    the earlier ones.
+    """
+    if workers <= 1:
+        for file in files:
+            yield file, partial(_open_member, file)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        try:
+            for file in files:
+                pending.append((file, pool.submit(_open_member, file)))
+                if len(pending) > workers:
+                    file, future = pending.popleft()
+                    yield file, future.result
+            while pending:
+                file, future = pending.popleft()
+                yield file, future.result
+        finally:
+            # Caller stopped early: close whatever was opened ahead of it
+            for file, future in pending:
+                if not future.cancel() and future.exception() is None:
+                    os.close(future.result()[0])
+
+
+def _extract_member(fd_in, offset, filesize, filename):
+    """
+    Writes filesize bytes of the archive, starting at offset, to filename.
+    Only positional reads are used on fd_in, so members can be extracted
+    concurrently from one shared descriptor.
+    """
+    fd_out = os.open(filename, CREATE_FLAGS, 0o644)
+    try:
+        if filesize:
+            try:
+                # Reserve the file's blocks up front
+                os.posix_fallocate(fd_out, 0, filesize)
+            except (AttributeError, OSError):
+                pass
+
+        # Copy file contents in-kernel, then in chunks for any remainder
+        copied = _kernel_copy(fd_in, fd_out, filesize, offset)
+        while copied < filesize:
+            chunk = os.pread(fd_in, min(filesize - copied, BUFSIZE), offset + copied)
+            if not chunk:
+                raise EOFError("Unexpected end of file")
+            os.write(fd_out, chunk)
+            copied += len(chunk)
+    finally:
+        os.close(fd_out)
 
 
 class Archiver:
@@ -7,141 +121,154 @@ class Archiver:
     Uses a custom binary format with headers containing file metadata.
     """
 
-    def __init__(self):
-        pass
-
-    def archive(self, output_path, files):
+    @staticmethod
+    def archive(output_path, files, workers=ARCHIVE_WORKERS):
         """
         Archives multiple files into a single file.
 
+        Files are opened and prefetched by a pool of worker threads while
+        the calling thread writes them to the archive in order.
+
         Args:
             output_path (str): Path where the archive will be created
             files (list): List of file paths to archive
+            workers (int): Number of prefetch threads; 1 archives serially
 
         Exits with error code 1 if any operation fails
         """
         try:
             # Open output file with write, create, and truncate flags
-            out_fd = os.open(output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            out_fd = os.open(output_path, CREATE_FLAGS, 0o644)
         except Exception as e:
             os.write(2, f"Failed to open output file: {str(e)}\n".encode())
             sys.exit(1)
 
-        for file in files:
+        for file, open_member in _prefetch(files, workers):
             # Validate file exists
             if not os.path.isfile(file):
                 os.write(2, f"File: {file}: does not exist!\n".encode())
                 os.close(out_fd)
                 sys.exit(1)
 
+            fd = None
             try:
-                fd = os.open(file, os.O_RDONLY)
+                fd, filesize = open_member()
 
                 # Create header information:
-                # - 8 bytes for file size
-                # - 8 bytes for filename length
+                # - 8 bytes for file size (big-endian)
+                # - 8 bytes for filename length (big-endian)
                 # - Variable bytes for filename
                 filename = os.path.basename(file).encode()
-                filename_len = len(filename)
-                filename_len = f"{filename_len:08d}".encode()
-                file_stat = os.fstat(fd)
-                filesize = file_stat.st_size
-                filesize = f"{filesize:08d}".encode()
-
-                # Write header to output file
-                os.write(out_fd, filesize)
-                os.write(out_fd, filename_len)
-                os.write(out_fd, filename)
-
-                # Write file contents in chunks
-                while True:
-                    chunk = os.read(fd, 4096)
+                header = HEADER.pack(filesize, len(filename))
+
+                # Write header to output file in a single syscall
+                os.writev(out_fd, [header, filename])
+
+                # Copy file contents in-kernel, falling back to a
+                # read/write loop for whatever the kernel could not copy
+                remaining = filesize - _kernel_copy(fd, out_fd, filesize)
+                while remaining > 0:
+                    chunk = os.read(fd, min(remaining, BUFSIZE))
                     if not chunk:
                         break
                     os.write(out_fd, chunk)
+                    remaining -= len(chunk)
 
             except Exception as e:
                 os.write(2, f"Error archiving {file}: {str(e)}\n".encode())
                 os.close(out_fd)
                 sys.exit(1)
             finally:
-                os.close(fd)
+                if fd is not None:
+                    os.close(fd)
 
-    def extract(self, archive_path):
+        os.close(out_fd)
+
+    @staticmethod
+    def extract(archive_path, workers=EXTRACT_WORKERS):
         """
         Extracts files from an archive.
 
+        All headers are read first; the files they describe are then
+        written out concurrently by a pool of worker threads.
+
         Args:
             archive_path (str): Path to the archive file
+            workers (int): Number of threads writing out files
 
         Exits with error code 1 if extraction fails
-        Note: Currently only extracts the first file in the archive
         """
         try:
             fd_in = os.open(archive_path, os.O_RDONLY)
         except Exception as e:
             os.write(2, f"Failed to open archive file: {str(e)}\n".encode())
             sys.exit(1)
-        filesize = os.fstat(fd_in).st_size
-
-        iters = 0
-        # FIXME: Missing loop to extract multiple files from archive
+        archive_size = os.fstat(fd_in).st_size
+        try:
+            # Archive is read front to back; let the kernel widen readahead
+            os.posix_fadvise(fd_in, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except (AttributeError, OSError):
+            pass
 
+        # First pass: walk the headers, collecting (offset, size, name) per file
+        members = []
+        offset = 0
+        header = bytearray(HEADER.size)
+        namebuf = bytearray(NAME_MAX)
         while True:
-            # Read file size from header (8 bytes)
-            filesize_byte = os.read(fd_in, 8)
-            if not filesize_byte or len(filesize_byte) < 8:
-                if iters == 0:
-                    print(f"Error reading header byte size: Got {filesize_byte}")
-                    sys.exit(1)
-                else:
+            # Read the header (16 bytes) and, speculatively, the filename in one syscall
+            nread = os.preadv(fd_in, [header, namebuf], offset)
+            if nread < HEADER.size:
+                if not members:
+                    print(f"Error reading header: Got {bytes(header[:nread])}")
                     os.close(fd_in)
-                    break
-            iters += 1
-            filesize = int(filesize_byte.decode())
-
-            # Read filename length from header (8 bytes)
-            filename_len_byte = os.read(fd_in, 8)
-            if not filename_len_byte or len(filename_len_byte) < 8:
-                print(f"Error reading header filename len: Got {filename_len_byte}")
+                    sys.exit(1)
+                break
+            filesize, filename_len = HEADER.unpack(header)
+            offset += HEADER.size
+            if offset + filename_len > archive_size:
+                os.write(2, f"Error reading header filename: length {filename_len} past end of archive".encode())
+                os.close(fd_in)
                 sys.exit(1)
-            filename_len = int(filename_len_byte.decode())
 
-            # Read filename (variable length based on filename_len)
-            filename_byte = os.read(fd_in, filename_len)
+            # Read filename (variable length based on filename_len); only
+            # names longer than NAME_MAX need a second read
+            if filename_len <= len(namebuf):
+                filename_byte = bytes(namebuf[:min(filename_len, nread - HEADER.size)])
+            else:
+                filename_byte = os.pread(fd_in, filename_len, offset)
             if not filename_byte or len(filename_byte) < 1:
                 os.write(2, f"Error reading header filename: Got {filename_byte}".encode())
                 os.close(fd_in)
                 sys.exit(1)
+            offset += filename_len
             filename = filename_byte.decode()
             filename = 'new_' + filename  # Prepend 'new_' to avoid overwriting original
 
-            try:
-                # Open output file for writing
-                fd_out = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
-
-                # Write file contents in chunks
-                remaining = filesize
-                while remaining > 0:
-                    chunk_size = min(remaining, 4096)
-                    chunk = os.read(fd_in, chunk_size)
-                    if not chunk:
-                        os.write(2, f"Error: Unexpected end of file while reading {filename}".encode())
-                        os.close(fd_out)
-                        os.close(fd_in)
-                        sys.exit(1)
-
-                    os.write(fd_out, chunk)
-                    remaining -= len(chunk)
-
-            except Exception as e:
-                os.write(2, f"Error creating file {filename}: {e}\n".encode())
-                if 'fd_out' in locals():
-                    os.close(fd_out)
+            if offset + filesize > archive_size:
+                os.write(2, f"Error: Unexpected end of file while reading {filename}".encode())
                 os.close(fd_in)
                 sys.exit(1)
-            finally:
-                if 'fd_out' in locals():
-                    os.close(fd_out)
+            members.append((offset, filesize, filename))
+            offset += filesize
+
+        # Files sharing a name would race on the same output; as in a serial
+        # extraction, the last one in the archive wins
+        latest = {filename: (offset, filesize) for offset, filesize, filename in members}
 
+        # Second pass: write the files out in parallel
+        failed = None
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            futures = [(filename, pool.submit(_extract_member, fd_in, offset, filesize, filename))
+                       for filename, (offset, filesize) in latest.items()]
+            for filename, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    failed = failed or (filename, e)
+        os.close(fd_in)
 
+        if failed:
+            filename, e = failed
+            os.write(2, f"Error creating file {filename}: {e}\n".encode())
+            sys.exit(1)
@@ -1,51 +1,224 @@
-import re
+import errno
+import os
+import select
 import socket
+import struct
+import sys
+
+RECVSIZE = 256 * 1024  # minimum free space offered to each recv
+RBUFSIZE = 1024 * 1024  # initial receive buffer capacity
+
+# MSG_ZEROCOPY (Linux 4.14+); the socket module does not export these names
+ZEROCOPY = sys.platform.startswith("linux")
+SO_ZEROCOPY = getattr(socket, "SO_ZEROCOPY", 60)
+MSG_ZEROCOPY = getattr(socket, "MSG_ZEROCOPY", 0x4000000)
+SO_EE_ORIGIN_ZEROCOPY = 5
+SOCK_EXTENDED_ERR = struct.Struct("=IBBBBII") # errno, origin, type, code, pad, info, data
+ZEROCOPY_MIN = 16 * 1024 # below this, pinning pages costs more than the copy
+ZEROCOPY_DRAIN_TIMEOUT = 5.0 # seconds close() waits for pinned sends to complete
+SPLICESIZE = 1024 * 1024 # bytes moved per splice when streaming to a file
 
 class EncapFramedSock:               # a facade
   def __init__(self, name):
     self.sock, self.name = name
-    self.rbuf = b""         # receive buffer
+    self.rbuf = bytearray(RBUFSIZE) # preallocated receive buffer
+    self.rpos = 0           # start of unconsumed data in rbuf
+    self.rend = 0           # end of received data in rbuf
+    self.zcSent = 0         # number of MSG_ZEROCOPY send calls issued
+    self.zcPending = []     # (last send call, payload) kept alive until the kernel is done
+    self.zerocopy = False
+    if ZEROCOPY:
+      try:
+        self.sock.setsockopt(socket.SOL_SOCKET, SO_ZEROCOPY, 1)
+        self.zerocopy = True
+      except OSError:
+        pass
     print(f"new framed sock: sock={self.sock}, name={self.name}")
 
   def shutdown(self):
     return self.sock.shutdown(socket.SHUT_WR)
   def close(self):
+    self._drainZerocopy(ZEROCOPY_DRAIN_TIMEOUT)
     return self.sock.close()
 
   def send(self, payload, debugPrint=0):
     if debugPrint: print("framedSend: sending %d byte message" % len(payload))
-    msg = str(len(payload)).encode() + b':' + payload
-    while len(msg):
-      nsent = self.sock.send(msg)
-      msg = msg[nsent:]
+    header = b"%d:" % len(payload)
+    if self.zerocopy and len(payload) >= ZEROCOPY_MIN:
+      self.sock.sendall(header)
+      return self._sendZerocopy(payload)
+    nsent = self.sock.sendmsg([header, payload])  # prefix and payload in one syscall
+    if nsent < len(header):
+      self.sock.sendall(header[nsent:])
+      nsent = len(header)
+    self.sock.sendall(memoryview(payload)[nsent - len(header):])
+
+  def _sendZerocopy(self, payload):
+    """Send payload with MSG_ZEROCOPY; payload is kept referenced (and must not be
+    mutated) until the kernel reports the send complete on the error queue."""
+    self._reapZerocopy()
+    first = self.zcSent
+    mv = memoryview(payload)
+    while mv:
+      try:
+        nsent = self.sock.send(mv, MSG_ZEROCOPY)
+      except OSError as e:
+        if e.errno != errno.ENOBUFS: raise
+        self.sock.sendall(mv)  # out of pinnable memory: fall back to copying
+        break
+      self.zcSent += 1
+      mv = mv[nsent:]
+    if self.zcSent > first:
+      self.zcPending.append((self.zcSent, payload))
+
+  def _reapZerocopy(self):
+    """Release payloads whose zerocopy sends the kernel has completed."""
+    while self.zcPending:
+      try:
+        _, ancdata, _, _ = self.sock.recvmsg(0, socket.CMSG_SPACE(SOCK_EXTENDED_ERR.size * 2),
+                                             socket.MSG_ERRQUEUE | socket.MSG_DONTWAIT)
+      except (BlockingIOError, InterruptedError):
+        return
+      for level, ctype, data in ancdata:
+        if len(data) < SOCK_EXTENDED_ERR.size: continue
+        _, origin, _, _, _, lo, hi = SOCK_EXTENDED_ERR.unpack_from(data)
+        if origin != SO_EE_ORIGIN_ZEROCOPY: continue
+        # notifications cover send calls lo..hi, numbered from 0
+        self.zcPending = [(last, p) for last, p in self.zcPending if last - 1 > hi]
+
+  def _drainZerocopy(self, timeout):
+    """Wait up to timeout seconds for outstanding zerocopy sends to complete."""
+    if not self.zcPending:
+      return
+    poller = select.poll()
+    poller.register(self.sock, select.POLLERR)
+    while self.zcPending:
+      try:
+        self._reapZerocopy()
+      except OSError:
+        return
+      if self.zcPending and not poller.poll(timeout * 1000):
+        return
+
+  def sendfile(self, file, count, debugPrint=0):
+    """Send count bytes of an open binary file, unframed, using sendfile(2).
+    The peer must already know count and read the bytes with recv_into_fd."""
+    if debugPrint: print("framedSendfile: sending %d unframed bytes" % count)
+    return self.sock.sendfile(file, count=count)
+
+  def recv_into_fd(self, fd, n, debugPrint=0):
+    """Write the next n unframed bytes of the stream to fd: first any already
+    buffered, then spliced socket->pipe->fd in the kernel where possible,
+    otherwise through recv_into. Returns the number of bytes written, which is
+    less than n only if the peer closed or reset the connection early."""
+    done = min(n, self.rend - self.rpos)
+    self._writeAll(fd, memoryview(self.rbuf)[self.rpos:self.rpos + done])
+    self.rpos += done
+    if self.rpos == self.rend:   # buffer drained, rewind
+      self.rpos = self.rend = 0
+    if done < n:
+      done += self._spliceToFd(fd, n - done)
+    while done < n:
+      try:
+        nread = self.sock.recv_into(memoryview(self.rbuf)[:min(n - done, len(self.rbuf))])
+      except OSError:
+        break                    # connection reset; report the short count
+      if nread == 0:
+        break
+      self._writeAll(fd, memoryview(self.rbuf)[:nread])
+      done += nread
+    if debugPrint: print("framedRecvIntoFd: wrote %d of %d bytes" % (done, n))
+    return done
+
+  def _spliceToFd(self, fd, n):
+    """Move up to n bytes from the socket to fd through a pipe with splice(2).
+    Returns the number of bytes moved; 0 if splice is unavailable here."""
+    if not hasattr(os, "splice"):
+      return 0
+    done = 0
+    pr, pw = os.pipe()
+    try:
+      while done < n:
+        try:
+          inPipe = os.splice(self.sock.fileno(), pw, min(n - done, SPLICESIZE), flags=os.SPLICE_F_MOVE)
+        except OSError:
+          break                  # unsupported or reset; the pipe is empty and the caller falls back to recv
+        if inPipe == 0:
+          break                  # peer closed
+        while inPipe:
+          try:
+            moved = os.splice(pr, fd, inPipe, flags=os.SPLICE_F_MOVE)
+          except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.ENOSYS): raise
+            while inPipe:        # fd refuses splice: drain the pipe through userspace
+              chunk = os.read(pr, inPipe)
+              self._writeAll(fd, chunk)
+              inPipe -= len(chunk)
+              done += len(chunk)
+            return done
+          inPipe -= moved
+          done += moved
+    finally:
+      os.close(pr)
+      os.close(pw)
+    return done
+
+  def _writeAll(self, fd, data):
+    while data:
+      data = data[os.write(fd, data):]
+
+  def _reserve(self, n):
+    """Ensure rbuf has room for n more bytes after rend, compacting before growing."""
+    if len(self.rbuf) - self.rend >= n:
+      return
+    if self.rpos:
+      pending = self.rend - self.rpos
+      self.rbuf[:pending] = self.rbuf[self.rpos:self.rend]
+      self.rpos, self.rend = 0, pending
+    short = n - (len(self.rbuf) - self.rend)
+    if short > 0:
+      self.rbuf.extend(bytes(max(short, len(self.rbuf))))
 
-  def receive(self, debugPrint=1):
+  def receive(self, debugPrint=0):
     state = "getLength"
     msgLength = -1
+    scan = 0                # rbuf[rpos:rpos+scan] is known not to hold a colon
     while True:
       if (state == "getLength"):
-        match = re.match(b'([^:]+):(.*)', self.rbuf, re.DOTALL | re.MULTILINE) # look for colon
-        if match:
-          lengthStr, self.rbuf = match.groups()
+        idx = self.rbuf.find(b':', self.rpos + scan, self.rend) # look for colon
+        if idx >= 0:
+          lengthStr = bytes(self.rbuf[self.rpos:idx])
+          self.rpos = idx + 1
           try: 
             msgLength = int(lengthStr)
-          except:
-            if len(self.rbuf):
-              print("badly formed message length:", lengthStr)
-              return None
+          except ValueError:
+            msgLength = -1
+          if msgLength < 0:
+            print("badly formed message length:", lengthStr)
+            return None
           state = "getPayload"
+        else:
+          scan = self.rend - self.rpos
       if state == "getPayload":
-        if len(self.rbuf) >= msgLength:
-         payload = self.rbuf[0:msgLength]
-         self.rbuf = self.rbuf[msgLength:]
+        if self.rend - self.rpos >= msgLength:
+         payload = bytes(memoryview(self.rbuf)[self.rpos:self.rpos + msgLength])
+         self.rpos += msgLength
+         if self.rpos == self.rend:   # buffer drained, rewind
+           self.rpos = self.rend = 0
          return payload
       try:
-        r = self.sock.recv(100)
-        self.rbuf += r
-        if len(r) == 0:
-          if len(self.rbuf) != 0:
-           print("FramedReceive: incomplete message. \n state=%s, length=%d, self.rbuf=%s" % (state, msgLength, self.rbuf))
+        if state == "getPayload":
+          # grow toward the claimed length only as data actually arrives
+          needed = msgLength - (self.rend - self.rpos)
+          self._reserve(min(needed, RECVSIZE))
+        else:
+          self._reserve(RECVSIZE)
+        n = self.sock.recv_into(memoryview(self.rbuf)[self.rend:])
+        self.rend += n
+        if n == 0:
+          if self.rend != self.rpos:
+           print("FramedReceive: incomplete message. \n state=%s, length=%d, buffered=%d" % (state, msgLength, self.rend - self.rpos))
           return None
       except:
         return None
-      if debugPrint: print("FramedReceive: state=%s, length=%d, self.rbuf=%s" % (state, msgLength, self.rbuf))
+      if debugPrint: print("FramedReceive: state=%s, length=%d, buffered=%d" % (state, msgLength, self.rend - self.rpos))
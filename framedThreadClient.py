@@ -1,7 +1,7 @@
 #! /usr/bin/env python3
 
 # Echo client program
-import socket, sys, re, os, uuid
+import socket, sys, re, os, uuid, struct
 from threading import Thread
 
 sys.path.append("../lib")       # for params
@@ -54,8 +54,7 @@ class Client(Thread):
         """
         # Generate a unique name for the archive
         self.archive_name = f"archive_{uuid.uuid4().hex[:8]}.tar"
-        archiver = Archiver()
-        archiver.archive(self.archive_name, self.file_list)
+        Archiver.archive(self.archive_name, self.file_list)
 
         # Get file size
         self.file_size = os.path.getsize(self.archive_name)
@@ -75,31 +74,24 @@ class Client(Thread):
 
     def send_header(self):
         """
-        Send the archive name and size in one frame.
+        Send the archive name and size in one frame:
+        name length (8 bytes, big-endian), name, file size (8 bytes, big-endian).
         """
-        header = f"{self.archive_name}\n{self.file_size}\n".encode()
+        name_bytes = self.archive_name.encode()
+        header = struct.pack(">Q", len(name_bytes)) + name_bytes + struct.pack(">Q", self.file_size)
         self.fsock.send(header, debugPrint=self.debug)
         if self.debug:
             print("[send_header] Sent header frame")
 
     def send_data(self):
         """
-        Stream the archive contents in multiple frames.
+        Stream the archive contents unframed via sendfile; the server
+        already knows their length from the header.
         """
-        fd_in = os.open(self.archive_name, os.O_RDONLY)
-        total_sent = 0
-
-        try:
-            while True:
-                chunk = os.read(fd_in, 4096)
-                if not chunk: # End of file
-                    break
-                self.fsock.send(chunk, debugPrint=self.debug)
-                total_sent += len(chunk)
-                if self.debug:
-                    print(f"[send_data] Sent {total_sent}/{self.file_size} bytes")
-        finally:
-            os.close(fd_in)
+        with open(self.archive_name, 'rb') as f:
+            total_sent = self.fsock.sendfile(f, self.file_size, debugPrint=self.debug)
+        if self.debug:
+            print(f"[send_data] Sent {total_sent}/{self.file_size} bytes")
 
     def wait_for_ack(self):
         """
@@ -2,12 +2,15 @@
 
 import sys
 sys.path.append("../lib")       # for params
-import re, socket, os
+import re, socket, os, struct, traceback
 from lib import params
-from threading import Thread
+from threading import Thread, BoundedSemaphore
+from concurrent.futures import ThreadPoolExecutor
 from encapFramedSock import EncapFramedSock
 from archiver import Archiver
 
+LISTEN_BACKLOG = 128  # pending connections the kernel queues for accept
+
 class Server(Thread):
     """
     A threaded server that uses a framed-socket to receive an archive file.
@@ -43,21 +46,21 @@ class Server(Thread):
         - Handle header and data based on state
         """
         print(f"New thread handling connection from {self.name}")
-        while True:
-            payload = self.fsock.receive(self.debug)
-            if not payload:
-                print(f"[{self.name}] No more data, connection closed.")
-                self.cleanup()
-                return
-
-            # Add payload to buffer
-            self.buffer += payload
-
-            # Dispatch to header/data logic
-            if self.state == 'header':
-                self.handle_header()
-            if self.state == 'data':
-                self.handle_data()
+        try:
+            while True:
+                payload = self.fsock.receive(self.debug)
+                if not payload:
+                    print(f"[{self.name}] No more data, connection closed.")
+                    return
+
+                # Dispatch to header/data logic; data goes straight to disk
+                if self.state == 'data':
+                    self.handle_data(payload)
+                else:
+                    self.buffer += payload
+                    self.handle_header()
+        finally:
+            self.cleanup()
 
     def handle_header(self):
         """
@@ -66,49 +69,66 @@ class Server(Thread):
         returns:
             None
         """
-        parts = self.buffer.split(b'\n', 2)
-        if len(parts) < 3:
-            # Not enough data for two header + remainder
+        # Header: name length (8 bytes), name, file size (8 bytes), all big-endian
+        if len(self.buffer) < 16:
             return
-        name_bytes, size_bytes, remainder = parts
-
-        self.archive_name = name_bytes.decode().strip()
-        self.file_size = int(size_bytes.decode().strip())
+        name_len, = struct.unpack_from(">Q", self.buffer, 0)
+        if len(self.buffer) < 16 + name_len:
+            # Not enough data for the whole header yet
+            return
+        self.archive_name = bytes(memoryview(self.buffer)[8:8 + name_len]).decode()
+        self.file_size, = struct.unpack_from(">Q", self.buffer, 8 + name_len)
+        remainder = self.buffer[16 + name_len:]
         if self.debug:
             print(f"[{self.name}] Header => archive_name={self.archive_name}, file_size={self.file_size}")
 
         # Prepare for writing data
-        self.fd_out = open('new_' + self.archive_name, 'wb')
-        self.received = len(remainder)
+        self.fd_out = os.open('new_' + self.archive_name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        if self.file_size:
+            try:
+                # Size is known up front: reserve the file's blocks
+                os.posix_fallocate(self.fd_out, 0, self.file_size)
+            except (AttributeError, OSError):
+                pass
+        self.received = 0
 
-        # Update state and add remaining data to buffer
-        self.buffer = remainder
+        # Update state and hand any data that followed the header to handle_data
+        self.buffer = b""
         self.state = 'data'
 
-        self.handle_data()
+        self.handle_data(remainder)
 
-    def handle_data(self):
+    def handle_data(self, payload):
         """
-        Handle incoming archive data and extract when complete.
+        Write incoming archive data straight to disk and extract when complete.
+
+        Args:
+            payload (bytes): Data received after the header.
 
         returns:
             None
         """
 
-        # Read all bytes in buffer
-        while self.buffer and self.received < self.file_size:
-            needed = self.file_size - self.received
-            chunk = self.buffer[:needed]
-            self.fd_out.write(chunk)
-            self.received += len(chunk)
-            self.buffer = self.buffer[len(chunk):]
+        # Write only the bytes belonging to the archive; keep any leftover
+        take = min(len(payload), self.file_size - self.received)
+        data = memoryview(payload)[:take]
+        while data:
+            nwritten = os.write(self.fd_out, data)
+            data = data[nwritten:]
+        self.received += take
+        self.buffer = payload[take:]
+
+        # The rest of the archive follows unframed; stream it straight to disk
+        if self.received < self.file_size:
+            self.received += self.fsock.recv_into_fd(self.fd_out, self.file_size - self.received, self.debug)
 
         # Once all bytes are read
         if self.received >= self.file_size:
-            self.fd_out.close()
+            os.close(self.fd_out)
+            self.fd_out = None
             print(f"Archive '{self.archive_name}' saved. Extracting...")
 
-            Archiver().extract(self.archive_name)
+            Archiver.extract(self.archive_name)
 
             # Send completion msg and cleanup
             print("Extraction complete.")
@@ -119,8 +139,13 @@ class Server(Thread):
 
     def cleanup(self):
         """Clean up resources: close file if open, and close socket."""
-        if self.fd_out and not self.fd_out.closed:
-            self.fd_out.close()
+        if self.fd_out is not None:
+            if self.received < self.file_size:
+                # Transfer cut short: drop the preallocated tail so the
+                # partial file doesn't look complete
+                os.ftruncate(self.fd_out, self.received)
+            os.close(self.fd_out)
+            self.fd_out = None
         self.fsock.close()
 
 def main():
@@ -152,13 +177,31 @@ def main():
     lsock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     bind_addr = ("localhost", listenPort)
     lsock.bind(bind_addr)
+    lsock.listen(LISTEN_BACKLOG)
     print(f"Listening on: {bind_addr}")
 
-    # Accept client connections and create handler threads
+    # Accept client connections and run their handlers on a bounded pool;
+    # only accept when a handler slot is free so the backlog absorbs bursts
+    max_workers = 2 * (os.cpu_count() or 1)
+    slots = BoundedSemaphore(max_workers)
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    def handler_done(future):
+        slots.release()
+        e = future.exception()
+        if e is not None and not isinstance(e, SystemExit):
+            # Report like an unhandled exception in a Thread would;
+            # SystemExit (e.g. Archiver.extract rejecting an archive) is silent
+            traceback.print_exception(type(e), e, e.__traceback__)
+
     while True:
-        sock_addr = lsock.accept()
+        slots.acquire()
+        try:
+            sock_addr = lsock.accept()
+        except BaseException:
+            slots.release()
+            raise
         server = Server(sock_addr, debug)
-        server.start()
+        pool.submit(server.run).add_done_callback(handler_done)
 
 if __name__ == "__main__":
     main()